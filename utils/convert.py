@@ -11,22 +11,36 @@ Main conversions:
 
 import os
 import argparse
-import pathlib
-import json
+import logging
 import re
 import shlex
+import time
 import traceback
 import yaml
+from collections import Counter, defaultdict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from datetime import datetime
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+log = logging.getLogger(__name__)
 
 
 # ============================================================================
 # Markdown Conversion Functions
 # ============================================================================
 
-class NoDatesSafeLoader(yaml.SafeLoader):
+# Prefer the LibYAML-backed loader when PyYAML was built with it. Dumping
+# stays pure Python: CSafeDumper escapes non-BMP characters (emoji) even
+# with allow_unicode, and there is only one dump per essay.
+try:
+    from yaml import CSafeLoader as _BaseLoader
+except ImportError:
+    from yaml import SafeLoader as _BaseLoader
+
+
+class NoDatesSafeLoader(_BaseLoader):
     pass
 
 
@@ -50,13 +64,8 @@ _FRONT_MATTER_RE = re.compile(
 )
 
 
-def extract_front_matter(md_text: str) -> Dict[str, Any]:
-    m = _FRONT_MATTER_RE.search(md_text)
-    if not m:
-        return {}
-
-    raw_yaml = m.group("yaml")
-
+def load_front_matter(raw_yaml: str) -> Dict[str, Any]:
+    """Parse the YAML between the front matter fences."""
     try:
         data = yaml.load(raw_yaml, Loader=NoDatesSafeLoader)
     except yaml.YAMLError as e:
@@ -70,24 +79,73 @@ def extract_front_matter(md_text: str) -> Dict[str, Any]:
     return data
 
 
+class LazyFrontMatter(MutableMapping):
+    """
+    Front matter mapping that defers YAML parsing until a key is accessed.
+
+    Front matter that is never modified is written back verbatim by
+    front_matter_to_str, without a load/dump round-trip.
+    """
+
+    def __init__(self, raw_yaml: str):
+        self.raw_yaml = raw_yaml
+        self.modified = False
+        self._data: Optional[Dict[str, Any]] = None
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = load_front_matter(self.raw_yaml)
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key: str) -> None:
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+def extract_front_matter(md_text: str) -> Dict[str, Any]:
+    m = _FRONT_MATTER_RE.search(md_text)
+    if not m:
+        return {}
+    return load_front_matter(m.group("yaml"))
+
+
 def extract_front_matter_from_file(path: Union[str, Path], encoding: str = "utf-8") -> Dict[str, Any]:
     return extract_front_matter(Path(path).read_text(encoding=encoding))
 
 
-def split_front_matter(md_text: str) -> Tuple[Dict[str, Any], str]:
+def split_front_matter(md_text: str) -> Tuple[MutableMapping, str]:
     """
-    Return (front_matter_dict, body_text).
+    Return (front_matter, body_text).
+    The front matter is a LazyFrontMatter; its YAML is parsed on first access.
     If no front matter, returns ({}, original_text).
     """
     m = _FRONT_MATTER_RE.search(md_text)
     if not m:
         return {}, md_text
-    fm = extract_front_matter(md_text)
+    fm = LazyFrontMatter(m.group("yaml"))
     body = md_text[m.end():]
     return fm, body
 
 
-def front_matter_to_str(fm: Dict[str, Any], encoding: str = "utf-8"):
+def front_matter_to_str(fm: MutableMapping, encoding: str = "utf-8"):
+    if isinstance(fm, LazyFrontMatter):
+        if not fm.modified:
+            return fm.raw_yaml + '\n'
+        fm = fm.data
     return yaml.safe_dump(
         fm,
         sort_keys=False,          # preserve key order (Python 3.7+)
@@ -95,22 +153,35 @@ def front_matter_to_str(fm: Dict[str, Any], encoding: str = "utf-8"):
         allow_unicode=True,
     )
 
-def unquote(value: str) -> str:
-    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
-        return value[1:-1]
-    return value
+# One whitespace-delimited token; a double-quoted run may contain whitespace
+TOKEN_RE = re.compile(r'(?:[^ \t\r\n"]|"[^"]*")+')
 
-import shlex
-from typing import Any, Dict
 
-def to_dict(s: str, *, warn: bool = True) -> Dict[str, Any]:
-    attrs: Dict[str, Any] = {}
+def _unquote(v: str) -> str:
+    if len(v) >= 2 and v[:1] == v[-1:] and v[:1] in ('"', "'"):
+        return v[1:-1]
+    return v
 
-    def unquote(v: str) -> str:
-        if len(v) >= 2 and v[0] == v[-1] and v[0] in ('"', "'"):
-            return v[1:-1]
-        return v
 
+def _attrs_from_tokens(tokens: Iterator[str]) -> Tuple[Tuple[str, Optional[str]], ...]:
+    attrs: Dict[str, Optional[str]] = {}
+    for token in tokens:
+        if '=' in token:
+            key, value = token.split('=', 1)
+            attrs[key] = _unquote(value)
+        else:
+            attrs[token] = None
+    # Kept as a tuple of pairs so cached results can't be mutated
+    return tuple(attrs.items())
+
+
+@lru_cache(maxsize=4096)
+def _parse_attrs(s: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    # Quotes only group whitespace into a token; shlex dropped them
+    return _attrs_from_tokens(token.replace('"', '') for token in TOKEN_RE.findall(s))
+
+
+def _parse_attrs_shlex(s: str) -> Tuple[Tuple[str, Optional[str]], ...]:
     lexer = shlex.shlex(s, posix=True)
     lexer.whitespace_split = True
     lexer.commenters = ''
@@ -119,182 +190,229 @@ def to_dict(s: str, *, warn: bool = True) -> Dict[str, Any]:
     try:
         tokens = list(lexer)
     except ValueError as e:
-        if warn:
-            print("WARNING: attribute parse error")
-            print(f"  error: {e}")
-            print(f"  text : {s}")
+        print("WARNING: attribute parse error")
+        print(f"  error: {e}")
+        print(f"  text : {s}")
         tokens = s.split()
 
-    for token in tokens:
-        if '=' in token:
-            key, value = token.split('=', 1)
-            attrs[key] = unquote(value)
-        else:
-            attrs[token] = None
+    return _attrs_from_tokens(tokens)
 
-    return attrs
 
-unrecognized_image_attrs = {}
-unrecognized_map_attrs = {}
+def to_dict(s: str) -> Dict[str, Optional[str]]:
+    """
+    Parse tag attributes (key=value, key="quoted value", bare flags) into a dict.
+    Bare flags map to None. Repeated attribute strings are parsed once.
+    Strings with backslash escapes or an unbalanced double quote go through
+    shlex, which warns and falls back to a whitespace split on the latter.
+    """
+    if '\\' in s or s.count('"') & 1:
+        return dict(_parse_attrs_shlex(s))
+    return dict(_parse_attrs(s))
+
+unrecognized_image_attrs = defaultdict(int)
+unrecognized_map_attrs = defaultdict(int)
+
+# Attributes emitted for each tag, in output order
+IMAGE_ORDER = ('id', 'src', 'manifest', 'seq', 'caption', 'attribution', 'description',
+               'label', 'license', 'source', 'cover', 'region', 'rotation', 'aspect')
+IMAGE_RECOGNIZED = frozenset(IMAGE_ORDER)
+IMAGE_EXTENSIONS = frozenset(('jpg', 'jpeg', 'png', 'svg', 'tif', 'tiff'))
+IMAGE_COMPARE_ORDER = ('id', 'before', 'after', 'caption', 'aspect')
+MAP_TAG_ORDER = ('id', 'center', 'zoom', 'basemap', 'basemaps', 'caption', 'aspect')
+MAP_TAG_RECOGNIZED = frozenset(MAP_TAG_ORDER)
+MAP_LINE_RECOGNIZED = frozenset(('url', 'layer'))
+IFRAME_ORDER = ('id', 'src', 'caption', 'aspect')
+YOUTUBE_ORDER = ('id', 'vid', 'caption')
+
+KNIGHTLAB_HEIGHT_RE = re.compile(r'&height=\d+')
+MAP_LINE_INNER_RE = re.compile(r'`([^`\n]*)`')   # inside of each line of a map block
+
+# All tag kinds in one alternation so the body is scanned once. The shared
+# opening backtick is factored out so the engine can skip ahead to candidate
+# backticks instead of trying every branch at every position. Each named
+# group is the attribute string handed to that kind's converter; maps get
+# the whole match instead, since their block begins with that backtick.
+# Where spans overlap (`image-compare`image`), the leftmost match wins;
+# the old one-pass-per-kind loop converted whichever kind ran first.
+TAG_RE = re.compile(
+    r"""
+    `(?:
+        (?<![^\n]`)(?P<map>map[^\n`]*`(?:\n`-[^\n`]*`)*)   # map block, must start at line beginning
+      | image-compare\b(?P<image_compare>[^`]*)`
+      | image(?P<image>(?:\s+[^`]*)?)`
+      | iframe\b(?P<iframe>[^`]*)`
+      | youtube\b(?P<youtube>[^`]*)`
+    )
+    """,
+    re.VERBOSE
+)
 
-def convert_params(md: str) -> str:
-    
-    ### Image
-    
-    def convert_image_tag(attrs_str):
-        attrs = to_dict(attrs_str)
-        recognized = set('id src manifest seq caption attribution description label license source cover region rotation aspect'.split(' '))
-        for attr in attrs:
-            if attr not in recognized:
-                if attr not in unrecognized_image_attrs:
-                    unrecognized_image_attrs[attr] = 0
-                unrecognized_image_attrs[attr] = unrecognized_image_attrs[attr] + 1
-             
-        tag = '{% include embed/image.html '
-        for attr in attrs:
-            if attr.startswith('#'):
-                tag += f'id="{attr[1:]}" '
-        
-        # print(json.dumps(attrs, indent=2))
-        for attr in 'id src manifest seq caption attribution description label license source cover region rotation aspect'.split(' '):
-            if attr in attrs:
-                if attr == 'src' and ('seq' in attrs or (not attrs[attr].startswith('wc:') and attrs[attr].split('.')[-1].lower() not in ['jpg', 'jpeg', 'png', 'svg', 'tif', 'tiff'])):
-                    tag += f'manifest="{attrs[attr]}" '
-                else:
-                    tag += f'{attr}="{attrs[attr]}" '
-        tag += '%}'
-        return tag
-
-    md = re.sub(r'`image(?:\s+([^`]*))?`', lambda m: convert_image_tag((m.group(1) or "").strip()), md)
-    
-    
-    ### Image Compare
-    
-    def convert_image_compare_tag(attrs_str):
-        attrs = to_dict(attrs_str)
-        tag = '{% include embed/image-compare.html '
-        for attr in attrs:
-            if attr.startswith('#'):
-                tag += f'id="{attr[1:]}" '
-                
-        for attr in 'id before after caption aspect'.split(' '):
-            if attr in attrs and attrs[attr]:
-                tag += f'{attr}="{attrs[attr]}" '
-        tag += 'class="right" %}'
-        return tag
-    
-    md = re.sub(r'`image-compare\b([^`]*)`', lambda m: convert_image_compare_tag(m.group(1).strip()), md)
 
+def _value(value: Optional[str]) -> str:
+    # Bare flags render as "None", as f-string formatting did
+    return 'None' if value is None else value
 
-    ## Map
-    
-    def convert_map_block(block):
-        markers = []
-        geojsons = []
-        lines = [line.strip()[1:-1] for line in block.split('\n')]
-        tag_attrs = to_dict(lines[0])
-        
-        recognized = set('id center zoom basemap basemaps caption aspect'.split(' '))
-        for attr in tag_attrs:
-            if attr not in recognized:
-                if attr not in unrecognized_map_attrs:
-                    unrecognized_map_attrs[attr] = 0
-                unrecognized_map_attrs[attr] = unrecognized_map_attrs[attr] + 1
-
-        for line in lines[1:]:
-            line_attrs = to_dict(line)
-            recognized = set('url layer'.split(' '))
-            for attr in line_attrs:
-                if attr not in recognized:
-                    if attr not in unrecognized_map_attrs:
-                        unrecognized_map_attrs[attr] = 0
-                    unrecognized_map_attrs[attr] = unrecognized_map_attrs[attr] + 1
-            if 'marker' in line_attrs:
-                marker = ''
-                if 'qid' in line_attrs:
-                    marker = line_attrs['qid']
-                if 'layer' in line_attrs:
-                    marker += f'~{line_attrs["layer"]}'
-                markers.append(marker)
-            if 'geojson' in line_attrs:
-                geojson = ''
-                if 'url' in line_attrs:
-                    geojson = line_attrs['url']
-                if 'layer' in line_attrs:
-                    geojson += f'~{line_attrs["layer"]}'
-                geojsons.append(geojson)
-        
-        tag = '{% include embed/map.html '
-        for attr in tag_attrs:
-            if attr.startswith('#'):
-                tag += f'id="{attr[1:]}" '
-
-        for attr in 'id center zoom basemap basemaps caption aspect'.split(' '):
-            if attr in tag_attrs:
-                tag += f'{attr if not attr == "basemaps" else "basemap"}="{tag_attrs[attr]}" '
-        if markers:
-            tag += f'markers="{"|".join(markers)}" '
-        if geojsons:
-            tag += f'geojson="{"|".join(geojsons)}" '
-        tag += '%}'
-        return tag
-        
-    MAP_BLOCK_RE = re.compile(
-        r"""
-        ^`map[^\n`]*`             # must start at line beginning
-        (?:\n`- [^\n`]*`)*        # continuation lines
-        """,
-        re.VERBOSE | re.MULTILINE
-    )
-    
-    md = MAP_BLOCK_RE.sub(lambda m: convert_map_block(m.group(0)), md)
-    
-    ### Iframe
-    
-    def convert_iframe_tag(attrs_str):
-        attrs = to_dict(attrs_str)
-        tag = '{% include embed/iframe.html '
+
+def _attr(key: str, value: Optional[str]) -> str:
+    return '%s="%s" ' % (key, _value(value))
+
+
+def _make_emitter(head: str, order: Tuple[str, ...], tail: str):
+    """
+    Build a renderer for a tag kind with a fixed attribute schema.
+
+    The returned function emits head, any #anchor ids, each non-empty
+    attribute in order, then tail. Key prefixes are rendered once here
+    rather than %-formatted on every call.
+    """
+    keyed = tuple((key, key + '="') for key in order)
+
+    def emit(attrs: Dict[str, Optional[str]]) -> str:
+        parts = [head]
         for attr in attrs:
-            if attr.startswith('#'):
-                tag += f'id="{attr[1:]}" '
-                
-        for attr in 'id src caption aspect'.split(' '):
-            if attr in attrs and attrs[attr]:
-                if attr == 'src' and 'knightlab.com' in attrs[attr]:
-                    attrs[attr] = re.sub(r'&height=\d+', '', attrs[attr])
-                tag += f'{attr}="{attrs[attr]}" '
-        tag += '%}'
-        return tag
+            if attr[:1] == '#':
+                parts += ('id="', attr[1:], '" ')
+        for key, prefix in keyed:
+            value = attrs.get(key)
+            if value:
+                parts += (prefix, value, '" ')
+        parts.append(tail)
+        return ''.join(parts)
+
+    return emit
+
+
+### Image
+
+def convert_image_tag(attrs_str: str) -> str:
+    attrs = to_dict(attrs_str.strip())
+    for attr in attrs:
+        if attr not in IMAGE_RECOGNIZED:
+            unrecognized_image_attrs[attr] += 1
+         
+    parts = ['{% include embed/image.html ']
+    for attr in attrs:
+        if attr.startswith('#'):
+            parts.append('id="%s" ' % attr[1:])
     
-    md = re.sub(r'`iframe\b([^`]*)`', lambda m: convert_iframe_tag(m.group(1).strip()), md)
+    for attr in IMAGE_ORDER:
+        if attr in attrs:
+            if attr == 'src' and ('seq' in attrs or (not attrs[attr].startswith('wc:') and attrs[attr].split('.')[-1].lower() not in IMAGE_EXTENSIONS)):
+                parts.append('manifest="%s" ' % attrs[attr])
+            else:
+                parts.append(_attr(attr, attrs[attr]))
+    parts.append('%}')
+    return ''.join(parts)
+
+
+### Image Compare
+
+_emit_image_compare = _make_emitter(
+    '{% include embed/image-compare.html ', IMAGE_COMPARE_ORDER, 'class="right" %}')
+
+def convert_image_compare_tag(attrs_str: str) -> str:
+    return _emit_image_compare(to_dict(attrs_str.strip()))
+
 
-    ### YouTube
+### Map
+
+def convert_map_block(block: str) -> str:
+    markers = []
+    geojsons = []
+    lines = MAP_LINE_INNER_RE.findall(block)
+    tag_attrs = to_dict(lines[0])
     
-    def convert_youtube_tag(attrs_str):
-        attrs = to_dict(attrs_str)
-        tag = '{% include embed/youtube.html '
-        for attr in attrs:
-            if attr.startswith('#'):
-                tag += f'id="{attr[1:]}" '
-                
-        for attr in 'id vid caption'.split(' '):
-            if attr in attrs and attrs[attr]:
-                # tag += f'{attr if attr != "vid" else "id"}="{attrs[attr]}" '
-                tag += f'{attr}="{attrs[attr]}" '
-        tag += 'aspect="1.55" %}'
-        return tag
+    for attr in tag_attrs:
+        if attr not in MAP_TAG_RECOGNIZED:
+            unrecognized_map_attrs[attr] += 1
+
+    for line in lines[1:]:
+        line_attrs = to_dict(line)
+        for attr in line_attrs:
+            if attr not in MAP_LINE_RECOGNIZED:
+                unrecognized_map_attrs[attr] += 1
+        if 'marker' in line_attrs:
+            marker = ''
+            if 'qid' in line_attrs:
+                marker = line_attrs['qid']
+            if 'layer' in line_attrs:
+                marker += '~' + _value(line_attrs['layer'])
+            markers.append(marker)
+        if 'geojson' in line_attrs:
+            geojson = ''
+            if 'url' in line_attrs:
+                geojson = line_attrs['url']
+            if 'layer' in line_attrs:
+                geojson += '~' + _value(line_attrs['layer'])
+            geojsons.append(geojson)
     
-    md = re.sub(r'`youtube\b([^`]*)`', lambda m: convert_youtube_tag(m.group(1).strip()), md)
+    parts = ['{% include embed/map.html ']
+    for attr in tag_attrs:
+        if attr.startswith('#'):
+            parts.append('id="%s" ' % attr[1:])
+
+    for attr in MAP_TAG_ORDER:
+        if attr in tag_attrs:
+            parts.append(_attr(attr if not attr == 'basemaps' else 'basemap', tag_attrs[attr]))
+    if markers:
+        parts.append('markers="%s" ' % '|'.join(markers))
+    if geojsons:
+        parts.append('geojson="%s" ' % '|'.join(geojsons))
+    parts.append('%}')
+    return ''.join(parts)
+
+
+### Iframe
+
+_emit_iframe = _make_emitter('{% include embed/iframe.html ', IFRAME_ORDER, '%}')
+
+def convert_iframe_tag(attrs_str: str) -> str:
+    attrs = to_dict(attrs_str.strip())
+    src = attrs.get('src')
+    if src and 'knightlab.com' in src:
+        attrs['src'] = KNIGHTLAB_HEIGHT_RE.sub('', src)
+    return _emit_iframe(attrs)
+
+
+### YouTube
+
+_emit_youtube = _make_emitter('{% include embed/youtube.html ', YOUTUBE_ORDER, 'aspect="1.55" %}')
+
+def convert_youtube_tag(attrs_str: str) -> str:
+    return _emit_youtube(to_dict(attrs_str.strip()))
+
+
+_HANDLERS = {
+    'image_compare': convert_image_compare_tag,
+    'image': convert_image_tag,
+    'iframe': convert_iframe_tag,
+    'youtube': convert_youtube_tag,
+}
+
+
+def _dispatch(m: re.Match) -> str:
+    kind = m.lastgroup
+    if kind == 'map':
+        return convert_map_block(m.group())
+    return _HANDLERS[kind](m.group(kind))
+
+
+def convert_params(md: str) -> str:
+    """Replace image, image-compare, map, iframe and youtube tags with Jekyll includes."""
+    if '`' not in md:
+        return md
+    return TAG_RE.sub(_dispatch, md)
+
 
-           
-    return md
+ROOT_LINK_RE = re.compile(r'\[([^\]]+)\]\(\s*/([^)\s]+)\s*\)')
 
 
-def update_links(text):
-    pattern = re.compile(r'\[([^\]]+)\]\(\s*/([^)\s]+)\s*\)')
+def update_links(text: str) -> str:
+    if '](' not in text:
+        return text
     replacement = r'[\1]({{ site.baseurl }}/\2)'
 
-    out = pattern.sub(replacement, text)
+    out = ROOT_LINK_RE.sub(replacement, text)
     return out
 
 
@@ -341,13 +459,17 @@ def extract_header_tag(md_text: str) -> Tuple[Dict[str, str], str]:
 
     return attrs, new_text
 
-RE_COLLAPSE_BLANK_LINES = re.compile(r'\n\s*\n+', re.MULTILINE)
-RE_ADD_BLANK_AFTER_HEADING = re.compile(r'^(#{1,6}\s+.+)\n(?!\s*\n)', re.MULTILINE)
-RE_EMPTY_HEADINGS = re.compile(r'^\s*#{1,6}\s*$', re.MULTILINE)
+RE_WRAP = re.compile(r'[ \t]*\{\:\s*\.wrap\s*\}[ \t]*')
+RE_CARET_HEADING = re.compile(r'\^[ \t]*#{1,6}[ \t]*')
+RE_HEADING = re.compile(r'#{1,6}\s+.')
+
+
+# clean() line states
+_CONTENT, _LEADING_BLANK, _BLANK, _EMPTY_HEADING, _EMPTY_HEADING_BLANK = range(5)
 
 def clean(text: str) -> str:
     """
-    Clean up converted markdown.
+    Clean up converted markdown in a single pass over its lines.
     
     Removes:
     - Button links
@@ -359,82 +481,223 @@ def clean(text: str) -> str:
     Ensures:
     - Blank line after headings
     """
-    text = re.sub(r'(?m)^[ \t]*\{\:\s*\.wrap\s*\}[ \t]*\n?', '', text)    
-    text = re.sub(r'(?m)^\^[ \t]*#{1,6}[ \t]*\n?', '', text)    
-    text = RE_COLLAPSE_BLANK_LINES.sub('\n\n', text)
-    text = RE_ADD_BLANK_AFTER_HEADING.sub(r'\1\n\n', text)
-    text = RE_EMPTY_HEADINGS.sub('', text)
-    return text
+    # Skip the line-removal checks when their marker can't occur
+    check_wrap = '{:' in text
+    check_caret = '^' in text
+
+    lines = text.split('\n')
+    last = len(lines) - 1
+    out = []
+    state = _CONTENT
+    run = 0                 # lines emitted since the last content line
+    heading = False         # last content line was a heading
+    for i, line in enumerate(lines):
+        if check_wrap and (m := RE_WRAP.match(line)):
+            line = line[m.end():]
+            if not line and i < last:
+                continue
+        if check_caret and (m := RE_CARET_HEADING.match(line)):
+            line = line[m.end():]
+            if not line and i < last:
+                continue
+
+        stripped = line.strip()
+        if stripped and len(stripped) <= 6 and not stripped.strip('#'):
+            # Empty headings become a blank line that absorbs the
+            # whitespace lines around it
+            if state not in (_EMPTY_HEADING, _EMPTY_HEADING_BLANK):
+                del out[len(out) - run:]
+                out.append('')
+                run = 1
+            state = _EMPTY_HEADING
+        elif not stripped:
+            if state in (_EMPTY_HEADING, _EMPTY_HEADING_BLANK):
+                state = _EMPTY_HEADING_BLANK
+            elif not out or i == last:
+                # Leading and trailing whitespace is kept as is
+                if heading and state == _CONTENT and out:
+                    out.append('')
+                out.append(line)
+                run += 1
+                state = _LEADING_BLANK
+            elif state != _BLANK:
+                out.append('')
+                run += 1
+                state = _BLANK
+        else:
+            if heading and state == _CONTENT:
+                out.append('')
+            out.append(line)
+            run = 0
+            state = _CONTENT
+            heading = line[:1] == '#' and RE_HEADING.match(line) is not None
+            continue
+        heading = False
+
+    return '\n'.join(out)
 
 # ============================================================================
 # Main Conversion Logic
 # ============================================================================
 
+def read_file(path: str, encoding: str = 'utf-8') -> str:
+    """
+    Read a whole file with read() calls sized from fstat().
+
+    Newlines are translated as text-mode open() does: \r\n and \r become \n.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size)
+        # read() may return fewer bytes than asked for; keep going until EOF
+        while len(data) < size:
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        os.close(fd)
+    text = data.decode(encoding)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _iter_leaf_dirs(dirs: List[os.DirEntry]) -> Iterator[os.DirEntry]:
+    for entry in dirs:
+        subdirs = []
+        has_index = False
+        with os.scandir(entry.path) as it:
+            for child in it:
+                if child.is_dir(follow_symlinks=False):
+                    subdirs.append(child)
+                elif child.name == 'index.md':
+                    has_index = True
+        if subdirs:
+            yield from _iter_leaf_dirs(subdirs)
+        elif has_index:
+            yield entry
+
+
+def iter_leaf_essays(src: str) -> Iterator[os.DirEntry]:
+    """
+    Yield the directory entry of every essay under src.
+
+    An essay is a leaf directory (no subdirectories) containing an index.md.
+    Directory types come from the cached scandir entries, so non-leaf
+    directories are skipped without any extra stat() calls.
+    """
+    with os.scandir(src) as it:
+        dirs = [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+    yield from _iter_leaf_dirs(dirs)
+
+
+def _init_worker(level: int) -> None:
+    # Spawned workers (the macOS default) start with logging unconfigured
+    logging.basicConfig(level=level)
+
+
+def process_one(root: str, birthtime: float, dest: str) -> Optional[Tuple[List[str], Dict[str, int], Dict[str, int]]]:
+    """
+    Convert a single essay directory.
+
+    Runs in a worker process, so it must stay a picklable top-level function.
+
+    Args:
+        root: Essay directory containing index.md
+        birthtime: Creation time of the essay directory
+        dest: Destination directory for converted files
+
+    Returns:
+        (listing_fields, unrecognized_image_attrs, unrecognized_map_attrs),
+        or None if the essay could not be converted.
+    """
+    # Counts are per essay; the parent process merges them
+    unrecognized_image_attrs.clear()
+    unrecognized_map_attrs.clear()
+
+    src_path = root.split('/')
+    
+    # Get creation date
+    t = time.localtime(birthtime)
+    creation_date = f'{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}'
+    
+    # Determine  filename
+    base_fname = src_path[-1]
+    dest_path = f'{dest}/{creation_date}-{base_fname}.md'
+    
+    # Read and convert markdown
+    md = read_file(f'{root}/index.md')
+    
+    fm, body = split_front_matter(md)
+    
+    header, body = extract_header_tag(body)
+            
+    fm['media_subpath'] = f'https://raw.githubusercontent.com/plant-humanities/chirpy/main/assets/{base_fname}'
+    fm['image'] = {'path': header['img']}
+    fm['auto_float'] = True
+
+    try:
+        body = convert_params(body)
+    except Exception as e:
+        print(f'Error converting params in {root}: {e}')
+        traceback.print_exc()
+        return None
+    
+    body = clean(body)
+    #body = update_links(body)
+    
+    # Write converted file
+    #with open(dest_path, 'w') as fp:
+        #fp.write('---\n' + front_matter_to_str(fm) + '---\n' + body)
+    # print(f'{root} -> {dest_path}')
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('%s front matter: %s', root, dict(fm))
+    row = [
+        root.split('/')[-1],
+        fm['date'], 
+        fm.get('author', fm.get('authors', '')), 
+        fm.get('title', '')
+    ]
+    return row, dict(unrecognized_image_attrs), dict(unrecognized_map_attrs)
+
+
 def convert(src: str, dest: str, max: Optional[int] = None, **kwargs):
     """
     Convert all essays in a directory tree.
     
+    Essays are converted in parallel, one worker process per CPU.
+
     Args:
         src: Source directory containing essays
         dest: Destination directory for converted files
         max: Maximum number of files to convert (for testing)
     """
-    ctr = 0
-    
-    for root, dirs, files in os.walk(src):
-        if 'index.md' not in files or dirs:
-            continue
-            
-        src_path = root.split('/')
-        
-        # Get creation date
-        creation_date = datetime.fromtimestamp(
-            Path(root).stat().st_birthtime
-        ).strftime('%Y-%m-%d')
-        
-        # Determine  filename
-        base_fname = src_path[-1]
-        dest_path = f'{dest}/{creation_date}-{base_fname}.md'
-        
-        # Read and convert markdown
-        md = pathlib.Path(f'{root}/index.md').read_text(encoding='utf-8')
-        
-        fm, body = split_front_matter(md)
-        
-        header, body = extract_header_tag(body)
-                
-        fm['media_subpath'] = f'https://raw.githubusercontent.com/plant-humanities/chirpy/main/assets/{base_fname}'
-        fm['image'] = {'path': header['img']}
-        fm['auto_float'] = True
-
-        try:
-            body = convert_params(body)
-        except Exception as e:
-            print(f'Error converting params in {root}: {e}')
-            traceback.print_exc()
-            continue
-        
-        body = clean(body)
-        #body = update_links(body)
-        
-        # Write converted file
-        ctr += 1
-        #with open(dest_path, 'w') as fp:
-            #fp.write('---\n' + front_matter_to_str(fm) + '---\n' + body)
-        # print(f'{ctr}. {root} -> {dest_path}')
-        print('\t'.join([
-            root.split('/')[-1],
-            fm['date'], 
-            fm.get('author', fm.get('authors', '')), 
-            fm.get('title', '')
-        ]))
-        # print(json.dumps(fm, indent=2 ))
-        
-        if max and ctr >= max:
-            break
-    
-    # print(json.dumps(unrecognized_image_attrs, indent=2))
-    # print(json.dumps(unrecognized_map_attrs, indent=2))
+    entries = list(iter_leaf_essays(src))
+    if max:
+        entries = entries[:max]
+
+    roots = [entry.path for entry in entries]
+    birthtimes = [entry.stat(follow_symlinks=False).st_birthtime for entry in entries]
+
+    image_attrs: Counter = Counter()
+    map_attrs: Counter = Counter()
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker,
+                             initargs=(logging.getLogger().getEffectiveLevel(),)) as ex:
+        results = ex.map(partial(process_one, dest=dest), roots, birthtimes, chunksize=16)
+        for result in results:
+            if result is None:
+                continue
+            row, image_counts, map_counts = result
+            image_attrs.update(image_counts)
+            map_attrs.update(map_counts)
+            print('\t'.join(row))
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('unrecognized image attrs: %s', dict(image_attrs))
+        log.debug('unrecognized map attrs: %s', dict(map_attrs))
 
 
 # ============================================================================
@@ -461,6 +724,13 @@ if __name__ == '__main__':
         default=None,
         help='Maximum number of files to convert (for testing)'
     )
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help='Log front matter and unrecognized attributes'
+    )
 
     args = vars(parser.parse_args())
+    if args.pop('debug'):
+        logging.basicConfig(level=logging.DEBUG)
     convert(**args)
\ No newline at end of file
@@ -11,90 +11,179 @@ Usage:
   python summarize_tags.py tags.csv --out tag_summary.csv
   python summarize_tags.py tags.csv --out tag_summary.csv --min-count 2
   python summarize_tags.py tags.csv --out tag_summary.csv --sort count_desc
+  python summarize_tags.py tags.csv --out tag_summary.csv --top-k 20
+  python summarize_tags.py tags.csv --out tag_summary.csv --sort-ids
+  python summarize_tags.py tags.csv --out tag_summary.parquet
+
+Only the standard library is needed, except for Parquet output, which
+requires pyarrow. Rows are read with csv.reader and positional indexing
+rather than a dict per row, so CSV output also runs unchanged under PyPy,
+whose JIT handles these loops well on large inputs:
+  pypy3 summarize_tags.py tags.csv --out tag_summary.csv
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import heapq
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 
-def read_tags_csv(path: Path) -> List[Tuple[str, Set[str]]]:
+def _parse_header(header: Optional[List[str]]) -> Tuple[int, Tuple[int, ...], int]:
     """
-    Returns list of (essay_id, set_of_tags).
+    Returns (id_idx, tag_idxs, width) for a header row.
+    """
+    if not header:
+        raise ValueError("Input CSV has no header row.")
+
+    if "id" not in header:
+        raise ValueError("Input CSV must contain an 'id' column.")
+
+    # Last occurrence wins for repeated names, as with DictReader
+    col = {name: i for i, name in enumerate(header)}
+    tag_cols = [c for c in header if c != "id" and c.lower().startswith("tag")]
+    if not tag_cols:
+        raise ValueError("Input CSV must contain tag columns named like tag1, tag2, ...")
+
+    id_idx = col["id"]
+    tag_idxs = tuple(col[c] for c in tag_cols)
+    return id_idx, tag_idxs, max(id_idx, *tag_idxs) + 1
+
+
+def _iter_rows(reader: Iterable[List[str]], id_idx: int, tag_idxs: Tuple[int, ...],
+               width: int) -> Iterator[Tuple[str, Dict[str, None]]]:
+    for r in reader:
+        if len(r) < width:
+            # Short rows are padded so the loop below can index freely
+            r += [""] * (width - len(r))
+        essay_id = r[id_idx].strip()
+        if not essay_id:
+            continue
+
+        # Dict keys dedupe like a set but keep column order, so tags are
+        # numbered the same way on every run regardless of hash seed
+        tags: Dict[str, None] = {}
+        for i in tag_idxs:
+            # Most tag cells are empty; only strip the ones that aren't
+            if (v := r[i]) and (v := v.strip()):
+                tags[v] = None
+        yield essay_id, tags
+
+
+def iter_tag_rows(path: Path) -> Iterator[Tuple[str, Dict[str, None]]]:
+    """
+    Yields (essay_id, tags) one row at a time, in file order; tags holds
+    the row's distinct tags as dict keys, in column order.
     Expects columns: id, tag1..tag10 (or any columns starting with 'tag')
     """
-    rows: List[Tuple[str, Set[str]]] = []
     with path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
-            raise ValueError("Input CSV has no header row.")
-
-        if "id" not in reader.fieldnames:
-            raise ValueError("Input CSV must contain an 'id' column.")
-
-        tag_cols = [c for c in reader.fieldnames if c != "id" and c.lower().startswith("tag")]
-        if not tag_cols:
-            raise ValueError("Input CSV must contain tag columns named like tag1, tag2, ...")
-
-        for r in reader:
-            essay_id = (r.get("id") or "").strip()
-            if not essay_id:
-                continue
-
-            tags = set()
-            for c in tag_cols:
-                v = (r.get(c) or "").strip()
-                if v:
-                    tags.add(v)
-            rows.append((essay_id, tags))
-    return rows
+        # Plain csv.reader with column positions resolved once from the
+        # header, rather than a dict per row from csv.DictReader
+        reader = csv.reader(f)
+        id_idx, tag_idxs, width = _parse_header(next(reader, None))
+        yield from _iter_rows(reader, id_idx, tag_idxs, width)
 
 
-def summarize(rows: List[Tuple[str, Set[str]]]) -> Dict[str, List[str]]:
+def summarize_and_write(rows: Iterable[Tuple[str, Iterable[str]]], out_path: Path,
+                        min_count: int, sort_mode: str, top_k: Optional[int] = None,
+                        sort_ids: bool = False, out_format: str = "csv") -> None:
     """
-    Build mapping tag -> sorted list of essay_ids that include that tag.
+    Build each tag's list of essay_ids from (essay_id, tags) rows and write:
+      tag,count,id1,id2,... (variable length per row)
+    Essay ids are listed in input order, or sorted if sort_ids is set.
+    Rows are consumed as they arrive, so `rows` can be a generator over the
+    input file. Tags are then numbered in first-seen order; rows are ordered
+    and filtered by number, and each posting list is released once its row is written.
+    If top_k is set, only the first top_k rows in sort order are written.
+    With out_format="parquet" the rows go to a Parquet file instead (see
+    write_summary_parquet).
     """
-    tag_to_ids: Dict[str, Set[str]] = defaultdict(set)
-    for essay_id, tags in rows:
-        for t in tags:
-            tag_to_ids[t].add(essay_id)
-
-    # Convert sets to sorted lists for stable output
-    return {t: sorted(list(ids)) for t, ids in tag_to_ids.items()}
+    if out_format not in ("csv", "parquet"):
+        raise ValueError("out_format must be one of: csv, parquet")
 
+    if sort_mode not in ("count_desc", "tag_asc"):
+        raise ValueError("sort_mode must be one of: count_desc, tag_asc")
 
-def write_summary_csv(tag_map: Dict[str, List[str]], out_path: Path, min_count: int, sort_mode: str) -> None:
-    """
-    Writes:
-      tag,count,id1,id2,... (variable length per row)
-    """
-    items = list(tag_map.items())
+    # (Two-pass builds were tried here: a Counter then exactly-sized lists,
+    # and a count/prefix-sum/scatter into flat CSR arrays. Without a JIT both
+    # are slower than appending, and both need the rows held for a rerun.)
+    postings: Dict[str, List[str]] = defaultdict(list)
+    seen_essays: Set[str] = set()
+    repeated = False
+    for essay_id, row_tags in rows:
+        # Only an essay listed on more than one row can repeat in a posting list
+        if essay_id in seen_essays:
+            repeated = True
+        else:
+            seen_essays.add(essay_id)
+        for t in row_tags:
+            postings[t].append(essay_id)
+
+    # From here on a tag is known by its first-seen position
+    tags = list(postings)
+    tag_to_ids: List[Optional[List[str]]] = list(postings.values())
+    del postings, seen_essays
+
+    if sort_ids:
+        tag_to_ids = [sorted(set(ids) if repeated else ids) for ids in tag_to_ids]
+    elif repeated:
+        tag_to_ids = [list(dict.fromkeys(ids)) for ids in tag_to_ids]
 
     if sort_mode == "count_desc":
-        items.sort(key=lambda kv: (-len(kv[1]), kv[0]))
-    elif sort_mode == "tag_asc":
-        items.sort(key=lambda kv: kv[0])
+        key = lambda tid: (-len(tag_to_ids[tid]), tags[tid])
     else:
-        raise ValueError("sort_mode must be one of: count_desc, tag_asc")
+        key = lambda tid: tags[tid]
+
+    kept = (tid for tid in range(len(tags)) if len(tag_to_ids[tid]) >= min_count)
+    if top_k is not None:
+        # Heap selection: O(n log k), and filtered tags never reach a list
+        order = heapq.nsmallest(top_k, kept, key=key)
+    else:
+        order = sorted(kept, key=key)
 
-    # Filter
-    items = [(t, ids) for t, ids in items if len(ids) >= min_count]
+    if out_format == "parquet":
+        write_summary_parquet(out_path, [tags[tid] for tid in order], [tag_to_ids[tid] for tid in order])
+        return
 
     # Figure out max number of ids across rows so we can make a consistent header
-    max_ids = max((len(ids) for _, ids in items), default=0)
+    max_ids = max((len(tag_to_ids[tid]) for tid in order), default=0)
 
     header = ["tag", "count"] + [f"id{i}" for i in range(1, max_ids + 1)]
 
+    # One shared run of blanks, sliced per row, pads short rows to the header
+    pad = [""] * max_ids
+
     with out_path.open("w", encoding="utf-8", newline="") as f:
         w = csv.writer(f)
         w.writerow(header)
-        for tag, ids in items:
-            row = [tag, str(len(ids))] + ids + [""] * (max_ids - len(ids))
-            w.writerow(row)
+        for tid in order:
+            ids = tag_to_ids[tid]
+            tag_to_ids[tid] = None
+            w.writerow([tags[tid], str(len(ids)), *ids, *pad[len(ids):]])
+
+
+def write_summary_parquet(out_path: Path, tags: List[str], id_lists: List[List[str]]) -> None:
+    """
+    Writes a zstd-compressed Parquet file with columns:
+      tag: string, count: int32, ids: list<string>
+    No padding is needed since each row holds its own list of ids.
+    Requires pyarrow, which is only imported when Parquet output is asked for.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow).") from e
+
+    table = pa.table({
+        "tag": pa.array(tags, type=pa.string()),
+        "count": pa.array([len(ids) for ids in id_lists], type=pa.int32()),
+        "ids": pa.array(id_lists, type=pa.list_(pa.string())),
+    })
+    pq.write_table(table, str(out_path), compression="zstd")
 
 
 def main() -> int:
@@ -104,14 +193,30 @@ def main() -> int:
     ap.add_argument("--min-count", type=int, default=1, help="Only include tags used in at least this many essays.")
     ap.add_argument("--sort", default="count_desc", choices=["count_desc", "tag_asc"],
                     help="Sort rows by descending count (default) or by tag name.")
+    ap.add_argument("--top-k", type=int, default=None, help="Only write the first K tags in sort order.")
+    ap.add_argument("--sort-ids", action="store_true",
+                    help="Sort each tag's essay ids instead of keeping input order.")
+    ap.add_argument("--format", default=None, choices=["csv", "parquet"],
+                    help="Output format (default: parquet if --out ends in .parquet, else csv). "
+                         "Parquet needs pyarrow.")
     args = ap.parse_args()
+    if args.top_k is not None and args.top_k < 1:
+        ap.error("--top-k must be a positive integer.")
 
     in_path = Path(args.in_csv).expanduser().resolve()
     out_path = Path(args.out).expanduser().resolve()
-
-    rows = read_tags_csv(in_path)
-    tag_map = summarize(rows)
-    write_summary_csv(tag_map, out_path, min_count=args.min_count, sort_mode=args.sort)
+    out_format = args.format or ("parquet" if out_path.suffix == ".parquet" else "csv")
+
+    # Fail before reading the input rather than after summarizing it
+    if out_format == "parquet":
+        try:
+            import pyarrow
+        except ImportError:
+            ap.error("Parquet output requires pyarrow (pip install pyarrow).")
+
+    summarize_and_write(iter_tag_rows(in_path), out_path,
+                        min_count=args.min_count, sort_mode=args.sort, top_k=args.top_k,
+                        sort_ids=args.sort_ids, out_format=out_format)
 
     print(f"Wrote: {out_path}")
     return 0